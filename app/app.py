@@ -1,5 +1,6 @@
 # app/app.py
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import List
@@ -15,6 +16,35 @@ IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg"}
 
 load_dotenv(PROJECT_ROOT / ".env")
 
+def _write_atomic(path: str, text: str) -> None:
+    """Replace path with text via a temp file + os.replace, so readers never see a partial file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def _create_unique(dest_dir: Path, stem: str, suffix: str):
+    """Atomically create dest_dir/<stem><suffix>, or <stem>-2<suffix>, -3, ... if taken.
+
+    O_EXCL lets the kernel settle name collisions, so there is no exists() probe per candidate
+    and two concurrent requests can never claim the same file. Returns (path, fd).
+    """
+    target = dest_dir / f"{stem}{suffix}"
+    n = 2
+    while True:
+        try:
+            return target, os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            target = dest_dir / f"{stem}-{n}{suffix}"
+            n += 1
+
 def create_app():
     # templates live at repo root: /pistlar/templates  -> /app/templates
     app = Flask(
@@ -40,20 +70,56 @@ def create_app():
 
     store = ContentStore(posts_dir, assets_url_prefix="/assets")
 
+    # dir path -> st_mtime_ns for every directory seen by the last walk, plus its result.
+    # Adding/removing/renaming an entry bumps its parent's mtime, so re-statting the known
+    # directories is enough to tell whether the tree needs walking again.
+    asset_cache = {"dirs": None, "list": []}
+
+    def _asset_dirs_unchanged(dirs) -> bool:
+        try:
+            return all(os.stat(d).st_mtime_ns == mtime for d, mtime in dirs.items())
+        except FileNotFoundError:
+            return False
+
     def _list_asset_images() -> List[str]:
+        dirs = asset_cache["dirs"]
+        if dirs is not None and _asset_dirs_unchanged(dirs):
+            return asset_cache["list"]
+
         images = []
-        base = Path(assets_dir)
-        if not base.exists():
+        if not os.path.isdir(assets_dir):
             return images
-        for root, _, files in os.walk(base):
-            root_path = Path(root)
-            for fname in files:
-                ext = Path(fname).suffix.lower()
-                if ext not in IMAGE_EXTS:
-                    continue
-                rel = (root_path / fname).relative_to(base).as_posix()
-                images.append(rel)
+        seen_dirs = {}
+        # entry.path always starts with assets_dir + os.sep, so rel paths are a plain slice
+        base_len = len(assets_dir.rstrip(os.sep)) + 1
+        stack = [assets_dir]
+        while stack:
+            root = stack.pop()
+            try:
+                # stat before listing so a change racing the scan still invalidates next time
+                seen_dirs[root] = os.stat(root).st_mtime_ns
+                it = os.scandir(root)
+            except OSError:
+                # unreadable or vanished dir: skip it like os.walk did
+                continue
+            with it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        # skip dot-dirs such as the fetch script's .blobs store
+                        if not entry.name.startswith("."):
+                            stack.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                    name = entry.name
+                    dot = name.rfind(".")
+                    if dot <= 0 or name[dot:].lower() not in IMAGE_EXTS:
+                        continue
+                    rel = entry.path[base_len:]
+                    images.append(rel if os.sep == "/" else rel.replace(os.sep, "/"))
         images.sort()
+        asset_cache["dirs"] = seen_dirs
+        asset_cache["list"] = images
         return images
 
     def _save_post_uploads(upload_files):
@@ -70,12 +136,10 @@ def create_app():
             if ext not in IMAGE_EXTS:
                 continue
             safe_name = secure_filename(file.filename) or "upload"
-            target = dest_dir / safe_name
-            counter = 2
-            while target.exists():
-                target = dest_dir / f"{target.stem}-{counter}{target.suffix}"
-                counter += 1
-            file.save(target)
+            stem, suffix = os.path.splitext(safe_name)
+            target, fd = _create_unique(dest_dir, stem, suffix)
+            with os.fdopen(fd, "wb") as fh:
+                file.save(fh)
             rel = target.relative_to(assets_dir).as_posix()
             uploaded_assets_local.append(f"{store.assets_url_prefix}/{rel}")
 
@@ -160,7 +224,7 @@ def create_app():
                 base_slug = slugify(title) or "post"
 
                 # Ensure unique slug
-                existing_slugs = {p.slug for p in store.all_posts()}
+                existing_slugs = store.slug_set()
                 final_slug = base_slug
                 n = 2
                 while final_slug in existing_slugs:
@@ -171,12 +235,6 @@ def create_app():
                 posts_dir_path = Path(posts_dir)
                 posts_dir_path.mkdir(parents=True, exist_ok=True)
 
-                target_path = posts_dir_path / f"{fname_base}.markdown"
-                i = 2
-                while target_path.exists():
-                    target_path = posts_dir_path / f"{fname_base}-{i}.markdown"
-                    i += 1
-
                 metadata = {
                     "title": title,
                     "date": date_obj.isoformat(),
@@ -188,8 +246,11 @@ def create_app():
                 fm_post = frontmatter.Post(body.rstrip() + "\n", **metadata)
                 rendered = frontmatter.dumps(fm_post).rstrip() + "\n"
 
-                with open(target_path, "w", encoding="utf-8") as fh:
+                target_path, fd = _create_unique(posts_dir_path, fname_base, ".markdown")
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
                     fh.write(rendered)
+                # rescan now so the new post is already indexed when its link is followed
+                store.refresh()
 
                 success = True
                 created_file = str(target_path)
@@ -299,10 +360,8 @@ def create_app():
                         fm.metadata.pop(image_key, None)
                     fm.content = body
 
-                    with open(post_obj.source_path, "w", encoding="utf-8") as fh:
-                        fh.write(frontmatter.dumps(fm).rstrip() + "\n")
-
-                    store._fingerprint = ""
+                    _write_atomic(post_obj.source_path, frontmatter.dumps(fm).rstrip() + "\n")
+                    store.refresh()
                     success = True
                     base_title = title
                     base_date = date_obj.isoformat()
@@ -1,23 +1,80 @@
 # pistlar/app/content_loader.py
-import os, re, datetime, unicodedata, frontmatter, markdown, bleach, hashlib
+from __future__ import annotations
+import os, re, datetime, unicodedata, frontmatter, markdown, nh3, hashlib, logging, json, yaml, threading, bisect, struct
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, KeysView, Optional, Tuple
 from datetime import timezone, time
+from time import monotonic
+
+# bleach's old defaults plus what the markdown extensions emit; anything else is escaped, not dropped
+ALLOWED_TAGS = frozenset(["a","abbr","acronym","b","blockquote","code","em","i","li","ol","strong","ul",
+                          "p","img","h1","h2","h3","h4","h5","h6","figure","figcaption","pre","br","hr",
+                          "table","thead","tbody","tr","th","td"])
+ALLOWED_ATTRIBUTES = {
+    "a": frozenset(["href","title"]),
+    "abbr": frozenset(["title"]),
+    "acronym": frozenset(["title"]),
+    "img": frozenset(["src","alt","title","loading"]),
+}
+ALLOWED_URL_SCHEMES = frozenset(["http","https","mailto"])
+
+# python-frontmatter already loads with yaml.CSafeLoader when PyYAML was built against libyaml;
+# otherwise every non-flat frontmatter block and every /edit load goes through pure-Python YAML
+if not getattr(yaml, "__with_libyaml__", False):
+    logging.warning("PyYAML has no libyaml support; frontmatter parsing falls back to pure Python")
+
+MARKDOWN_EXTENSIONS = ["extra","abbr","attr_list","admonition","sane_lists","toc","tables","fenced_code"]
+
+# markdown.Markdown keeps per-document state between reset() and convert(), and posts are
+# rendered lazily from whichever request thread touches them first, so one instance per thread
+_md_local = threading.local()
+
+def _python_markdown(text: str) -> str:
+    md = getattr(_md_local, "md", None)
+    if md is None:
+        md = _md_local.md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return md.reset().convert(text)
+
+def _make_markdown_renderer() -> Tuple[str, Callable[[str], str]]:
+    # MARKDOWN_BACKEND=cmark opts into cmark-gfm (C); CommonMark rejects e.g. spaces in link
+    # targets that Python-Markdown accepts, hence not the default
+    if os.environ.get("MARKDOWN_BACKEND", "").lower() == "cmark":
+        try:
+            import cmarkgfm
+            from cmarkgfm.cmark import Options
+        except ImportError:
+            logging.warning("MARKDOWN_BACKEND=cmark but cmarkgfm is not installed; using Python-Markdown")
+        else:
+            # raw HTML is passed through and left to the sanitizer, same as with Python-Markdown
+            opts = Options.CMARK_OPT_UNSAFE
+            return "cmark", lambda text: cmarkgfm.github_flavored_markdown_to_html(text, options=opts)
+    return "markdown", _python_markdown
+
+MARKDOWN_BACKEND, render_markdown = _make_markdown_renderer()
+
+POST_EXTS = (".md", ".markdown", ".mdown", ".mkdn")
 
-ALLOWED_TAGS = list(bleach.sanitizer.ALLOWED_TAGS) + ["p","img","h1","h2","h3","h4","h5","h6","figure","figcaption","pre","code","blockquote"]
-ALLOWED_ATTRIBUTES = {**bleach.sanitizer.ALLOWED_ATTRIBUTES, "img": ["src","alt","title","loading"]}
+# bump whenever the markdown/sanitizer setup changes so stale on-disk renders are discarded
+RENDER_CACHE_VERSION = 3
 
-md = markdown.Markdown(extensions=["extra","abbr","attr_list","admonition","sane_lists","toc","tables","fenced_code"])
+# reloads touching at least this many files read/parse them on a thread pool
+PARALLEL_PARSE_MIN = 16
 
-POST_EXTS = (".md", ".markdown", ".mdown", ".mkdn")
+_SLUG_STRIP = re.compile(r"[^a-zA-Z0-9\-\s]")
+_SLUG_DASH = re.compile(r"[\s_]+")
+_ISO_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+_FN_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})-")
+# anything an HTML parser would read as a start/end tag
+_HTML_TAG = re.compile(r"</?([A-Za-z][^\s/>]*)[^<>]*>")
 
 def slugify(value: str) -> str:
     value = unicodedata.normalize("NFKD", value).encode("ascii","ignore").decode("ascii")
-    value = re.sub(r"[^a-zA-Z0-9\-\s]", "", value).strip().lower()
-    value = re.sub(r"[\s\_]+", "-", value)
+    value = _SLUG_STRIP.sub("", value).strip().lower()
+    value = _SLUG_DASH.sub("-", value)
     return value
 
-def _to_aware_utc(dt) -> datetime.datetime:
+def _to_aware_utc(dt: Any) -> datetime.datetime:
     if isinstance(dt, datetime.datetime):
         pass
     elif isinstance(dt, datetime.date):
@@ -27,7 +84,7 @@ def _to_aware_utc(dt) -> datetime.datetime:
         try:
             dt = datetime.datetime.fromisoformat(s)
         except Exception:
-            m = re.match(r"^(\d{4})-(\d{2})-(\d{2})$", s)
+            m = _ISO_DATE.match(s)
             if m:
                 y, mo, d = map(int, m.groups())
                 dt = datetime.datetime(y, mo, d, 12, 0, 0)
@@ -39,160 +96,436 @@ def _to_aware_utc(dt) -> datetime.datetime:
         dt = dt.astimezone(timezone.utc)
     return dt
 
+def _escape_disallowed_tag(m: re.Match[str]) -> str:
+    tag = m.group(0)
+    if m.group(1).lower() in ALLOWED_TAGS:
+        return tag
+    return "&lt;" + tag[1:-1] + "&gt;"
+
+def _render_html(content: str) -> Tuple[str, str]:
+    """Markdown -> sanitized (html, summary_html)."""
+    html = render_markdown(content)
+    # nh3 deletes unknown tags outright; posts quote things like "trú á <honum>", which
+    # bleach(strip=False) used to show as text, so escape those first
+    html = _HTML_TAG.sub(_escape_disallowed_tag, html)
+    html = nh3.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES,
+                     url_schemes=ALLOWED_URL_SCHEMES, link_rel=None)
+    return html, _first_paragraph_html(html)
+
 @dataclass(order=True)
 class Post:
     sort_index: datetime.datetime = field(init=False, repr=False)
     title: str
     slug: str
     date: datetime.datetime
-    summary_html: str
-    html: str
     image: Optional[str]
     source_path: str
-    def __post_init__(self):
+    # sha1 of the raw file bytes; keys the on-disk render cache
+    content_hash: str = field(default="", repr=False, compare=False)
+    # markdown body, kept only until .html/.summary_html is first read and renders it
+    raw_content: Optional[str] = field(default=None, repr=False, compare=False)
+    _html: Optional[str] = field(default=None, repr=False, compare=False)
+    _summary_html: Optional[str] = field(default=None, repr=False, compare=False)
+    _on_render: Optional[Callable[["Post"], None]] = field(default=None, repr=False, compare=False)
+    def __post_init__(self) -> None:
         self.sort_index = self.date
 
+    @property
+    def html(self) -> str:
+        html = self._html
+        if html is None:
+            html = self._render()[0]
+        return html
+
+    @property
+    def summary_html(self) -> str:
+        summary_html = self._summary_html
+        if summary_html is None:
+            summary_html = self._render()[1]
+        return summary_html
+
+    def _render(self) -> Tuple[str, str]:
+        raw = self.raw_content
+        if raw is None:
+            # another thread rendered it between our _html check and here; raw_content is
+            # only cleared after both fields are set, so don't re-render (and cache) ""
+            return self._html or "", self._summary_html or ""
+        html, summary_html = _render_html(raw)
+        self._summary_html = summary_html
+        self._html = html
+        self.raw_content = None
+        if self._on_render:
+            self._on_render(self)
+        return html, summary_html
+
+def _newest_first(post: Post) -> Tuple[float, str]:
+    # source_path breaks date ties so a full sort and the bisect patching agree on order
+    return -post.date.timestamp(), post.source_path
+
 def _parse_date_from_filename(name: str) -> Optional[datetime.datetime]:
-    m = re.match(r"^(\d{4})-(\d{2})-(\d{2})-", name)
+    m = _FN_DATE.match(name)
     if not m:
         return None
     y, mo, d = map(int, m.groups())
     return datetime.datetime(y, mo, d, 12, 0, 0, tzinfo=timezone.utc)
 
 def _first_paragraph_html(rendered: str) -> str:
-    m = re.search(r"<p[\s\S]*?</p>", rendered, flags=re.IGNORECASE)
-    return m.group(0) if m else (rendered.split("</p>")[0] + "</p>" if "</p>" in rendered else rendered)
-
-# ---------- NEW: recursive traversal + robust fingerprint ----------
-def _iter_post_files(posts_dir: str):
-    try:
-        for root, dirs, files in os.walk(posts_dir):
-            dirs[:] = [d for d in dirs if not d.startswith(".")]
-            for fname in files:
-                if fname.lower().endswith(POST_EXTS):
-                    yield os.path.join(root, fname)
-    except FileNotFoundError:
-        return
-
-def _calc_fingerprint_for_dir(posts_dir: str) -> str:
-    items = []
-    for fpath in _iter_post_files(posts_dir):
+    # plain find() instead of a regex: the sanitizer always emits lowercase tags
+    start = rendered.find("<p")
+    if start >= 0:
+        end = rendered.find("</p>", start + 2)
+        if end >= 0:
+            return rendered[start:end + 4]
+    return rendered.split("</p>")[0] + "</p>" if "</p>" in rendered else rendered
+
+# ---------- fast path for the flat `key: value` frontmatter these posts use ----------
+_FM_BOUNDARY = re.compile(r"^-{3,}\s*$", re.MULTILINE)
+# the only keys _parse_post reads; anything else in the block is skipped unparsed
+_FM_KEYS = frozenset(["title", "date", "slug", "image", "img", "cover", "thumbnail"])
+# plain scalars YAML would resolve to bool/null rather than str
+_YAML_WORDS = frozenset(["yes", "no", "true", "false", "on", "off", "null", "~"])
+_NEEDS_YAML = object()
+
+def _fast_scalar(v: str) -> Any:
+    if not v:
+        return None
+    if v[0] == '"':
+        inner = v[1:-1]
+        if len(v) < 2 or v[-1] != '"' or '"' in inner or "\\" in inner:
+            return _NEEDS_YAML
+        return inner
+    if v[0] == "'":
+        inner = v[1:-1]
+        if len(v) < 2 or v[-1] != "'" or "'" in inner.replace("''", ""):
+            return _NEEDS_YAML
+        return inner.replace("''", "'")
+    if v[0] in "[]{}&*!|>%@`#,?:-":
+        return _NEEDS_YAML
+    # a comment starts at "#" preceded by any YAML whitespace, tab included
+    hash_at = min((i for i in (v.find(" #"), v.find("\t#")) if i >= 0), default=-1)
+    if hash_at >= 0:
+        v = v[:hash_at].rstrip()
+    if ": " in v or v.endswith(":"):
+        return _NEEDS_YAML
+    m = _ISO_DATE.match(v)
+    if m:
         try:
-            st = os.stat(fpath)
-            rel = os.path.relpath(fpath, posts_dir)
-            items.append(f"{rel}:{int(st.st_mtime)}:{st.st_size}")
-        except FileNotFoundError:
+            return datetime.date(*map(int, m.groups()))
+        except ValueError:
+            return _NEEDS_YAML
+    # numbers, timestamps and YAML's bool/null words keep their exact YAML typing
+    if v[0] in "0123456789.+" or v.lower() in _YAML_WORDS:
+        return _NEEDS_YAML
+    return v
+
+def _fast_frontmatter(raw: str) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Split frontmatter like frontmatter.loads(), without running PyYAML.
+
+    Only the keys in _FM_KEYS are extracted. Returns None whenever the block is anything but
+    flat one-line `key: value` pairs (indented/multiline values, exotic scalars) so the caller
+    can fall back to frontmatter itself.
+    """
+    text = raw.strip()
+    if not _FM_BOUNDARY.match(text):
+        return None
+    parts = _FM_BOUNDARY.split(text, 2)
+    if len(parts) != 3:
+        return None
+    _, block, content = parts
+    meta: Dict[str, Any] = {}
+    for line in block.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if line[0] in " \t\"'?-":
+            return None
+        key, sep, value = line.partition(":")
+        if not sep or (value and value[0] not in " \t"):
+            return None
+        key = key.strip()
+        if key not in _FM_KEYS:
             continue
-    items.sort()
-    return hashlib.sha256(("|".join(items)).encode("utf-8")).hexdigest()
+        value = _fast_scalar(value.strip())
+        if value is _NEEDS_YAML:
+            return None
+        meta[key] = value
+    return meta, content.strip()
 # ------------------------------------------------------------------
 
-class ContentStore:
-    def __init__(self, posts_dir: str, assets_url_prefix: str = "/assets"):
-        self.posts_dir = posts_dir
-        self.assets_url_prefix = assets_url_prefix
-        self._fingerprint = ""
-        self._posts: List[Post] = []
+def _normalize_image(image_str: str, assets_url_prefix: str) -> str:
+    s = str(image_str).strip()
 
-    def _calc_fingerprint(self) -> str:
-        return _calc_fingerprint_for_dir(self.posts_dir)
+    # strip optional leading ":" shorthand
+    if s.startswith(":"):
+        s = s[1:]
 
-    def _load(self):
-        import logging
-        logging.getLogger().setLevel(logging.INFO)
-        
-        new_fp = self._calc_fingerprint()
-        if new_fp == self._fingerprint and self._posts:
-            return
+    # absolute or data/url → leave as-is
+    if s.startswith(("http://", "https://", "data:")):
+        return s
 
-        logging.info("past fingerprint")
+    # normalize any leading slashes
+    s = s.lstrip("/")
 
-        posts: List[Post] = []
-        if not os.path.isdir(self.posts_dir):
-            self._posts = []
-            self._fingerprint = new_fp
-            return
+    # if author wrote "assets/..." or "/assets/..."
+    if s.startswith("assets/"):
+        return f"/{s}"
 
-        logging.info("past post list")
+    # if author wrote "img/..." or "images/..." under assets root
+    if s.startswith(("img/", "images/")):
+        return f"{assets_url_prefix}/{s}"
 
-        for fpath in _iter_post_files(self.posts_dir):
-            fname = os.path.basename(fpath)
-            try:
-                fm = frontmatter.load(fpath)
-            except Exception:
-                with open(fpath, "r", encoding="utf-8") as fh:
-                    raw = fh.read()
-                fm = frontmatter.Post(raw, **{})
+    # fallback: treat as a filename in the posts bucket
+    return f"{assets_url_prefix}/img/posts/{s}"
 
-            title = fm.get("title") or os.path.splitext(fname)[0]
+# ---------- NEW: recursive traversal + robust fingerprint ----------
+def _iter_post_files_with_stat(posts_dir: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """Yield (path, stat_result) for every post file under posts_dir, skipping hidden dirs.
 
-            logging.info("Post title: %s", title)
+    One scandir pass: DirEntry carries d_type, so only post files themselves get stat()ed.
+    """
+    stack = [posts_dir]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            # unreadable or vanished dir (e.g. a root-only lost+found): skip it like os.walk did
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            stack.append(entry.path)
+                    elif entry.name.lower().endswith(POST_EXTS) and not entry.is_dir():
+                        yield entry.path, entry.stat()
+                except OSError:
+                    continue
+
+_FP_STAT = struct.Struct("<qq")
+
+def _fingerprint_for_stats(entries: Iterable[Tuple[str, os.stat_result]]) -> str:
+    # fed incrementally instead of hashing one big joined string; this only detects
+    # changes, so a short blake2b digest is plenty
+    h = hashlib.blake2b(digest_size=16)
+    for fpath, st in sorted(entries, key=lambda e: e[0]):
+        h.update(os.fsencode(fpath))
+        h.update(b"\0")
+        h.update(_FP_STAT.pack(st.st_mtime_ns, st.st_size))
+    return h.hexdigest()
 
+def _calc_fingerprint_for_dir(posts_dir: str) -> str:
+    return _fingerprint_for_stats(_iter_post_files_with_stat(posts_dir))
+# ------------------------------------------------------------------
 
-            dval = fm.get("date")
-            date = _to_aware_utc(dval) if dval is not None else (_parse_date_from_filename(fname) or _to_aware_utc(datetime.datetime.now()))
+def _read_render_cache(path: str) -> Dict[str, Tuple[str, str]]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != RENDER_CACHE_VERSION or data.get("backend") != MARKDOWN_BACKEND:
+        return {}
+    return {k: (v[0], v[1]) for k, v in data.get("entries", {}).items()}
+
+def _write_render_cache(path: str, entries: Dict[str, Tuple[str, str]]) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"version": RENDER_CACHE_VERSION, "backend": MARKDOWN_BACKEND, "entries": entries}, fh, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        # e.g. posts_dir mounted read-only: the cache is an optimisation, carry on without it
+        logging.info("ContentStore: render cache not written to %s (%s)", path, e)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
 
-            slug = fm.get("slug") or slugify(title)
+class ContentStore:
+    def __init__(self, posts_dir: str, assets_url_prefix: str = "/assets", render_cache_path: Optional[str] = None):
+        self.posts_dir = posts_dir
+        self.assets_url_prefix = assets_url_prefix
+        self.render_cache_path = render_cache_path or os.environ.get("RENDER_CACHE") or os.path.join(posts_dir, ".render_cache.json")
+        # content_hash -> (html, summary_html); read from disk on first load, flushed after new renders
+        self._render_cache: Optional[Dict[str, Tuple[str, str]]] = None
+        self._render_cache_dirty = False
+        # request threads add renders while a reload prunes and writes the cache
+        self._render_lock = threading.Lock()
+        # one rescan at a time: the incremental patch below assumes _posts matches _by_path
+        self._load_lock = threading.Lock()
+        self._fingerprint = ""
+        # rescans within this many seconds of the previous one are skipped; refresh() forces one
+        self._ttl = float(os.environ.get("CONTENT_TTL", "2"))
+        self._last_check_ts = 0.0
+        # source_path -> (st_mtime_ns, st_size, Post); only entries whose stat changed get re-parsed
+        self._by_path: Dict[str, Tuple[int, int, Post]] = {}
+        # immutable so all_posts() can hand it out without copying
+        self._posts: Tuple[Post, ...] = ()
+        self._by_slug: Dict[str, Post] = {}
+
+    def refresh(self) -> None:
+        """Rescan posts_dir right away, e.g. after a handler wrote a post."""
+        # under the lock, so a rescan already in flight (which may predate the write) finishes first
+        with self._load_lock:
+            self._fingerprint = ""
+            self._rescan()
+
+    def _remember_render(self, post: Post) -> None:
+        with self._render_lock:
+            if self._render_cache is not None:
+                self._render_cache[post.content_hash] = (post.html, post.summary_html)
+                self._render_cache_dirty = True
+
+    def _flush_render_cache(self) -> None:
+        # keep only renders of current files so the cache can't grow without bound
+        current = {entry[2].content_hash for entry in self._by_path.values()}
+        with self._render_lock:
+            if not self._render_cache_dirty or self._render_cache is None:
+                return
+            self._render_cache = {h: v for h, v in self._render_cache.items() if h in current}
+            self._render_cache_dirty = False
+            # written outside the lock from a copy, so renders landing meanwhile can't disturb json.dump
+            snapshot = dict(self._render_cache)
+        _write_render_cache(self.render_cache_path, snapshot)
+
+    def _parse_post(self, fpath: str) -> Post:
+        fname = os.path.basename(fpath)
+        with open(fpath, "rb") as fh:
+            data = fh.read()
+        content_hash = hashlib.sha1(data).hexdigest()
+        raw = data.decode("utf-8")
+        parsed = _fast_frontmatter(raw)
+        if parsed is None:
+            try:
+                fm = frontmatter.loads(raw)
+                parsed = fm.metadata, fm.content
+            except Exception:
+                parsed = {}, raw
+        meta, content = parsed
 
-            # accept multiple keys
-            image = fm.get("image") or fm.get("img") or fm.get("cover") or fm.get("thumbnail")
+        title = meta.get("title") or os.path.splitext(fname)[0]
 
-            def _normalize_image(image_str: str, assets_url_prefix: str) -> str:
-                s = str(image_str).strip()
+        logging.info("Post title: %s", title)
 
-                # strip optional leading ":" shorthand
-                if s.startswith(":"):
-                    s = s[1:]
+        dval = meta.get("date")
+        date = _to_aware_utc(dval) if dval is not None else (_parse_date_from_filename(fname) or _to_aware_utc(datetime.datetime.now()))
 
-                # absolute or data/url → leave as-is
-                if s.startswith(("http://", "https://", "data:")):
-                    return s
+        slug = meta.get("slug") or slugify(title)
 
-                # normalize any leading slashes
-                s = s.lstrip("/")
+        # accept multiple keys
+        image = meta.get("image") or meta.get("img") or meta.get("cover") or meta.get("thumbnail")
+        if image:
+            image = _normalize_image(image, self.assets_url_prefix)
 
-                # if author wrote "assets/..." or "/assets/..."
-                if s.startswith("assets/"):
-                    return f"/{s}"
+        post = Post(
+            title=title, slug=slug, date=date,
+            image=image, source_path=fpath, content_hash=content_hash
+        )
+        cached = self._render_cache.get(content_hash) if self._render_cache is not None else None
+        if cached:
+            post._html, post._summary_html = cached
+        else:
+            # rendered on first access; most posts are never shown in a given process
+            post.raw_content = content
+            post._on_render = self._remember_render
+        return post
 
-                # if author wrote "img/..." or "images/..." under assets root
-                if s.startswith(("img/", "images/")):
-                    return f"{assets_url_prefix}/{s}"
+    def _fresh(self) -> bool:
+        return bool(self._fingerprint) and monotonic() - self._last_check_ts < self._ttl
 
-                # fallback: treat as a filename in the posts bucket
-                return f"{assets_url_prefix}/img/posts/{s}"
+    def _load(self) -> None:
+        if self._fresh():
+            return
+        with self._load_lock:
+            # another thread may have finished a rescan while this one waited
+            if not self._fresh():
+                self._rescan()
 
-            if image:
-                image = _normalize_image(image, self.assets_url_prefix)
+    def _rescan(self) -> None:
+        self._last_check_ts = monotonic()
 
-            html = md.reset().convert(fm.content)
-            html = bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=False)
-            summary_html = _first_paragraph_html(html)
+        logging.getLogger().setLevel(logging.INFO)
+        
+        entries = list(_iter_post_files_with_stat(self.posts_dir))
+        new_fp = _fingerprint_for_stats(entries)
+        if new_fp == self._fingerprint and self._posts:
+            self._flush_render_cache()
+            return
+
+        logging.info("past fingerprint")
+
+        if not os.path.isdir(self.posts_dir):
+            self._by_path = {}
+            self._posts = ()
+            self._by_slug = {}
+            self._fingerprint = new_fp
+            return
 
-            posts.append(Post(
-                title=title, slug=slug, date=date,
-                summary_html=summary_html, html=html,
-                image=image, source_path=fpath
-            ))
+        logging.info("past post list")
 
-        posts.sort(key=lambda p: p.date, reverse=True)
-        self._posts = posts
+        if self._render_cache is None:
+            self._render_cache = _read_render_cache(self.render_cache_path)
+
+        def unchanged(fpath: str, st: os.stat_result) -> bool:
+            cached = self._by_path.get(fpath)
+            return cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size
+
+        stale = [fpath for fpath, st in entries if not unchanged(fpath, st)]
+        if len(stale) >= PARALLEL_PARSE_MIN:
+            # file reads and sha1 release the GIL, which is most of a cold load
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+                fresh = dict(zip(stale, ex.map(self._parse_post, stale)))
+        else:
+            fresh = {fpath: self._parse_post(fpath) for fpath in stale}
+        parsed = len(stale)
+
+        by_path: Dict[str, Tuple[int, int, Post]] = {}
+        for fpath, st in entries:
+            post = fresh.get(fpath) or self._by_path[fpath][2]
+            by_path[fpath] = (st.st_mtime_ns, st.st_size, post)
+
+        # paths that vanished from disk simply aren't carried over
+        dropped = [entry[2] for fpath, entry in self._by_path.items() if fpath not in by_path or fpath in fresh]
+        if self._posts and len(fresh) + len(dropped) <= len(by_path) // 4:
+            # only a few posts changed: patch the already sorted sequence instead of re-sorting it
+            posts = list(self._posts)
+            for old in dropped:
+                i = bisect.bisect_left(posts, _newest_first(old), key=_newest_first)
+                while posts[i] is not old:
+                    i += 1
+                del posts[i]
+            for post in fresh.values():
+                bisect.insort(posts, post, key=_newest_first)
+        else:
+            posts = sorted((entry[2] for entry in by_path.values()), key=_newest_first)
+        # newest post wins on duplicate slugs, same as the old linear scan
+        by_slug: Dict[str, Post] = {}
+        for p in posts:
+            by_slug.setdefault(p.slug, p)
+        # readers don't take the lock, so swap in the finished structures together
+        self._by_path = by_path
+        self._posts = tuple(posts)
+        self._by_slug = by_slug
+
+        self._flush_render_cache()
 
         logging.info("ContentStore: scanning %s", self.posts_dir)
-        logging.info("ContentStore: %d posts loaded", len(posts))
+        logging.info("ContentStore: %d posts loaded (%d parsed)", len(posts), parsed)
         if posts:
             logging.info("ContentStore: first=%s (%s)", posts[0].title, posts[0].source_path)
 
         self._fingerprint = new_fp
 
     # ✅ The methods your app calls:
-    def all_posts(self) -> List[Post]:
+    def all_posts(self) -> Tuple[Post, ...]:
         self._load()
-        return list(self._posts)
+        return self._posts
 
     def by_slug(self, slug: str) -> Optional[Post]:
         self._load()
-        for p in self._posts:
-            if p.slug == slug:
-                return p
-        return None
+        return self._by_slug.get(slug)
+
+    def slug_set(self) -> KeysView[str]:
+        """Read-only view of every known slug."""
+        self._load()
+        return self._by_slug.keys()
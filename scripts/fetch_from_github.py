@@ -1,65 +1,367 @@
 #!/usr/bin/env python3
-import argparse, os, requests, pathlib
+import argparse, hashlib, io, json, os, pathlib, shutil, sys, tarfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 
 GITHUB_API = "https://api.github.com"
+RAW_HOST = "https://raw.githubusercontent.com"
 
-def fetch_dir(repo, path, ref="master", token=None):
+def _has_brotli():
+    # httpx only decodes br when one of these is importable
+    for mod in ("brotli", "brotlicffi"):
+        try:
+            __import__(mod)
+            return True
+        except ImportError:
+            pass
+    return False
+
+# built once; the client carries the defaults and calls only pass an Accept override
+DEFAULT_HEADERS = {"Accept": "application/vnd.github+json",
+                   "Accept-Encoding": "gzip, br" if _has_brotli() else "gzip"}
+RAW_ACCEPT = {"Accept": "application/vnd.github.raw"}
+SHA_ACCEPT = {"Accept": "application/vnd.github.sha"}
+# images and archives are already compressed; asking for gzip only burns CPU on both ends
+IDENTITY = {"Accept-Encoding": "identity"}
+PRECOMPRESSED = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".mp4", ".zip", ".gz")
+
+RETRY_STATUSES = {429, 502, 503, 504}
+LOW_REMAINING = 10
+
+def rate_limit_wait(response):
+    # seconds GitHub told us to hold off for, or None if this 403/429 isn't a rate limit
+    if "Retry-After" in response.headers:
+        return float(response.headers["Retry-After"])
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        return float(response.headers.get("X-RateLimit-Reset", 0)) - time.time()
+    return None
+
+def throttle(response):
+    # nearly out of quota: wait for the window to reset rather than run into 403s
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    if remaining is None or int(remaining) >= LOW_REMAINING:
+        return
+    delay = float(response.headers.get("X-RateLimit-Reset", 0)) - time.time()
+    if delay > 0:
+        print(f"GitHub rate limit nearly used up, waiting {delay:.0f}s for it to reset", file=sys.stderr)
+        time.sleep(delay)
+
+class RetryTransport(httpx.HTTPTransport):
+    # back off and retry rate limits and flaky gateways; connect errors are retried by httpx itself
+    def handle_request(self, request):
+        for attempt in range(5):
+            response = super().handle_request(request)
+            wait = rate_limit_wait(response) if response.status_code in (403, 429) else None
+            if wait is None and response.status_code not in RETRY_STATUSES:
+                throttle(response)
+                return response
+            response.close()
+            time.sleep(max(0.0, wait) if wait is not None else 0.5 * 2 ** attempt)
+        return super().handle_request(request)
+
+def make_client(token=None):
+    # HTTP/2 multiplexes every concurrent GET over one TLS connection per host
+    headers = {**DEFAULT_HEADERS, "Authorization": f"Bearer {token}"} if token else DEFAULT_HEADERS
+    return httpx.Client(transport=RetryTransport(http2=True, retries=3), headers=headers, timeout=30)
+
+def default_branch(client, repo):
+    r = client.get(f"{GITHUB_API}/repos/{repo}")
+    r.raise_for_status()
+    return r.json()["default_branch"]
+
+def commit_sha(client, repo, ref):
+    r = client.get(f"{GITHUB_API}/repos/{repo}/commits/{ref}", headers=SHA_ACCEPT)
+    r.raise_for_status()
+    return r.text.strip()
+
+def compare(client, repo, base, head):
+    # files touched between two commits, shaped like tree entries; None means "do a full sync"
+    r = client.get(f"{GITHUB_API}/repos/{repo}/compare/{base}...{head}")
+    if r.status_code == 404:
+        return None  # base commit is gone (force-push) or unknown
+    r.raise_for_status()
+    data = r.json()
+    # base...head diffs from the merge base, so after a reset ("behind") or a force-push
+    # ("diverged") the listed files miss changes and only a full sync is right
+    if data.get("status") not in ("ahead", "identical"):
+        return None
+    files = data.get("files", [])
+    if len(files) >= 300:
+        return None  # GitHub stops listing files at 300
+    return [{"path": f["filename"], "sha": f["sha"]} for f in files if f.get("status") != "removed"]
+
+def fetch_dir(client, repo, path, ref):
     url = f"{GITHUB_API}/repos/{repo}/contents/{path}?ref={ref}"
-    headers = {"Accept": "application/vnd.github+json"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    r = requests.get(url, headers=headers, timeout=30)
-    if r.status_code == 404 and ref == "master":
-        # try common alt default branch
-        url = f"{GITHUB_API}/repos/{repo}/contents/{path}?ref=main"
-        r = requests.get(url, headers=headers, timeout=30)
+    r = client.get(url)
     r.raise_for_status()
     return r.json()
 
-def fetch_file(repo, path, ref="master", token=None):
-    url = f"{GITHUB_API}/repos/{repo}/contents/{path}?ref={ref}"
-    headers = {"Accept": "application/vnd.github.raw"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    r = requests.get(url, headers=headers, timeout=30)
-    if r.status_code == 404 and ref == "master":
-        url = f"{GITHUB_API}/repos/{repo}/contents/{path}?ref=main"
-        r = requests.get(url, headers=headers, timeout=30)
+def list_tree(client, repo, ref):
+    # one recursive tree listing instead of a contents listing per directory;
+    # the trees endpoint resolves a branch name or commit sha itself
+    r = client.get(f"{GITHUB_API}/repos/{repo}/git/trees/{ref}?recursive=1")
     r.raise_for_status()
-    return r.content
+    tree = r.json()
+    if tree.get("truncated"):
+        return None
+    return [e for e in tree["tree"] if e.get("type") == "blob"]
+
+def files_in(tree, path):
+    prefix = path.rstrip("/") + "/"
+    return {e["path"][len(prefix):]: e["sha"] for e in tree
+            if e["path"].startswith(prefix) and "/" not in e["path"][len(prefix):]}
+
+def git_blob_sha(path):
+    # same id git gives the blob, so it can be compared with the tree entry's sha
+    try:
+        size = path.stat().st_size
+        h = hashlib.sha1(b"blob %d\0" % size)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+def changed(names, out_dir):
+    return {n: sha for n, sha in names.items() if git_blob_sha(out_dir / n) != sha}
+
+def precompressed(name):
+    # judged by the file's own name: assets land in the blob store under a bare sha
+    return os.path.splitext(name)[1].lower() in PRECOMPRESSED
+
+def fetch_blob(client, repo, sha, dest, name):
+    # content-addressed by sha, so there is no path to resolve and nothing to revalidate
+    headers = {**RAW_ACCEPT, **IDENTITY} if precompressed(name) else RAW_ACCEPT
+    with client.stream("GET", f"{GITHUB_API}/repos/{repo}/git/blobs/{sha}", headers=headers) as r:
+        r.raise_for_status()
+        write_chunks(dest, r.iter_bytes(1 << 16))
+
+def fetch_raw(client, repo, path, dest, ref):
+    # raw host is CDN-backed and skips the API quota and JSON envelope
+    headers = IDENTITY if precompressed(path) else None
+    with client.stream("GET", f"{RAW_HOST}/{repo}/{ref}/{path}", headers=headers) as r:
+        r.raise_for_status()
+        # stream straight into the file so big images are never held in memory whole
+        write_chunks(dest, r.iter_bytes(1 << 16))
+
+def write_chunks(dest, chunks):
+    tmp = dest.with_name(dest.name + ".part")
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+def link_into(blob, dest):
+    # hardlink where the filesystem allows it, a plain copy where it doesn't
+    tmp = dest.with_name(dest.name + ".part")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(blob, tmp)
+    except OSError:
+        shutil.copyfile(blob, tmp)
+    os.replace(tmp, dest)
+
+def supports_hardlinks(directory):
+    probe = directory / f".probe.{os.getpid()}"
+    try:
+        probe.touch()
+        os.link(probe, probe.with_name(probe.name + ".link"))
+    except OSError:
+        return False
+    else:
+        os.unlink(probe.with_name(probe.name + ".link"))
+        return True
+    finally:
+        probe.unlink(missing_ok=True)
+
+def prune_blobs(blobs_dir):
+    # a blob with a single link is no longer referenced by any asset
+    try:
+        it = os.scandir(blobs_dir)
+    except FileNotFoundError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False) and entry.stat().st_nlink == 1:
+                os.unlink(entry.path)
+
+class IterReader(io.RawIOBase):
+    # file-like view over a byte iterator, so tarfile can read the response as it arrives
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buf = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buf:
+            self._buf = next(self._chunks, b"")
+            if not self._buf:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+def fetch_snapshot(client, repo, ref, targets):
+    # the whole repo as one gzip'd tar stream: one request however many files there are
+    url = f"{GITHUB_API}/repos/{repo}/tarball/{ref}"
+    with client.stream("GET", url, follow_redirects=True) as r:
+        r.raise_for_status()
+        # the tar stream can only be read in order, so hand each file to a writer thread
+        # and keep decompressing; the semaphore caps how many files sit in memory meanwhile
+        in_flight = threading.BoundedSemaphore(8)
+        written = []
+        with ThreadPoolExecutor(max_workers=4) as writers, \
+                tarfile.open(fileobj=io.BufferedReader(IterReader(r.iter_bytes(1 << 16))), mode="r|gz") as tf:
+            for m in tf:
+                if not m.isfile():
+                    continue
+                # members are "<owner>-<repo>-<sha>/<path>"
+                src_dir, _, name = m.name.partition("/")[2].rpartition("/")
+                out_dir, suffix = targets.get(src_dir, (None, None))
+                if out_dir is None or not name.endswith(suffix):
+                    continue
+                data = tf.extractfile(m).read()
+                in_flight.acquire()
+                fut = writers.submit(write_chunks, out_dir / name, (data,))
+                fut.add_done_callback(lambda _: in_flight.release())
+                written.append(fut)
+                yield f"{src_dir}/{name}"
+        for fut in written:
+            fut.result()
+
+def sync_key(args):
+    # a record only counts for the same source, directories and mode it was made with
+    return {"repo": args.repo, "posts_path": args.posts_path.strip("/"),
+            "assets_path": args.assets_path.strip("/"), "mode": args.mode}
+
+def read_last_sync(path, key):
+    try:
+        record = json.loads(path.read_text())
+        sha = record.pop("sha")
+    except (OSError, ValueError, AttributeError, KeyError):
+        return None
+    return sha if record == key else None
+
+def write_last_sync(path, key, sha):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({**key, "sha": sha}) + "\n")
+    os.replace(tmp, path)
 
 def main():
     ap = argparse.ArgumentParser(description="Fetch posts and assets from a GitHub repo into content/")
     ap.add_argument("--repo", required=True, help="e.g. bjornlevi/bjornlevi.github.io")
     ap.add_argument("--posts-path", dest="posts_path", default="_posts")
     ap.add_argument("--assets-path", dest="assets_path", default="assets/img/posts")
-    ap.add_argument("--ref", default="master", help="branch or commit (default: master; will fallback to main if 404)")
+    ap.add_argument("--ref", help="branch or commit (default: the repo's default branch)")
     ap.add_argument("--token", default=os.environ.get("GITHUB_TOKEN"))
     ap.add_argument("--dest", default="content")
+    ap.add_argument("--jobs", type=int, default=10, help="parallel downloads (default: 10)")
+    ap.add_argument("--mode", choices=("files", "snapshot"), default="files",
+                    help="files: download changed files one by one; snapshot: extract them from one repo tarball")
     args = ap.parse_args()
 
     posts_out = pathlib.Path(args.dest)/"posts"
     assets_out = pathlib.Path(args.dest)/"assets"/"img"/"posts"
     posts_out.mkdir(parents=True, exist_ok=True)
     assets_out.mkdir(parents=True, exist_ok=True)
+    client = make_client(args.token)
+    if not args.ref:
+        # one lookup up front instead of a master 404 and a main retry on every request
+        args.ref = default_branch(client, args.repo)
+    last_sync_path = pathlib.Path(args.dest)/".last_sync"
+    last_sync = read_last_sync(last_sync_path, sync_key(args))
+    head = commit_sha(client, args.repo, args.ref)
+
+    if args.mode == "snapshot":
+        print(f"Fetching snapshot of {args.repo} @ {args.ref}")
+        targets = {args.posts_path.strip("/"): (posts_out, ".md"), args.assets_path.strip("/"): (assets_out, "")}
+        for path in fetch_snapshot(client, args.repo, head, targets):
+            print(" -", path)
+        write_last_sync(last_sync_path, sync_key(args), head)
+        client.close()
+        print("Done.")
+        return
+
+    if last_sync == head:
+        client.close()
+        print(f"{args.repo} @ {args.ref} unchanged since the last sync.")
+        return
+    # after a previous sync only the files touched since then need looking at
+    tree = compare(client, args.repo, last_sync, head) if last_sync else None
+    if tree is None:
+        tree = list_tree(client, args.repo, head)
+
+    def listing(src_dir, out_dir, md_only):
+        if tree is not None:
+            names = files_in(tree, src_dir)
+        else:
+            # repo too big for a single tree response; list the directory instead
+            names = {item["name"]: item["sha"] for item in fetch_dir(client, args.repo, src_dir, head)
+                     if item.get("type") == "file"}
+        if md_only:
+            names = {n: sha for n, sha in names.items() if n.endswith(".md")}
+        # files whose bytes already match the listed blob never hit the network
+        return changed(names, out_dir)
+
+    # everything that gets here already failed the blob sha check, so it is fetched
+    # unconditionally; an If-None-Match 304 would only preserve the wrong bytes
+    def fetch_into(src_dir, name, sha, dest):
+        if args.token:
+            # blobs count against the API quota, which is only roomy (5000/h) with a token
+            fetch_blob(client, args.repo, sha, dest, name)
+        else:
+            # by commit sha, not branch: the raw CDN caches branch URLs for minutes after a push
+            fetch_raw(client, args.repo, f"{src_dir}/{name}", dest, head)
+        return name
+
+    # assets are stored once per blob sha and hardlinked into place, so an image reused
+    # under another name (or restored later) is a link instead of a download
+    blobs_dir = pathlib.Path(args.dest)/"assets"/".blobs"
+    blobs_dir.mkdir(exist_ok=True)
+    sha_locks = {}
+    sha_locks_guard = threading.Lock()
+
+    def download(src_dir, out_dir, name, sha):
+        if out_dir is not assets_out:
+            return fetch_into(src_dir, name, sha, out_dir / name)
+        blob = blobs_dir / sha
+        with sha_locks_guard:
+            lock = sha_locks.setdefault(sha, threading.Lock())
+        with lock:
+            label = f"{name} (from local store)"
+            # an in-place write through any link would corrupt the blob, so check before reusing it
+            if git_blob_sha(blob) != sha:
+                label = fetch_into(src_dir, name, sha, blob)
+            link_into(blob, out_dir / name)
+        return label
 
-    print(f"Fetching posts from {args.repo}:{args.posts_path} @ {args.ref}")
-    for item in fetch_dir(args.repo, args.posts_path, args.ref, args.token):
-        if item.get("type") != "file" or not item.get("name","").endswith(".md"):
-            continue
-        name = item["name"]
-        print(" -", name)
-        data = fetch_file(args.repo, f"{args.posts_path}/{name}", args.ref, args.token)
-        (posts_out / name).write_bytes(data)
-
-    print(f"Fetching assets from {args.repo}:{args.assets_path} @ {args.ref}")
-    for item in fetch_dir(args.repo, args.assets_path, args.ref, args.token):
-        if item.get("type") != "file":
-            continue
-        name = item["name"]
-        print(" -", name)
-        data = fetch_file(args.repo, f"{args.assets_path}/{name}", args.ref, args.token)
-        (assets_out / name).write_bytes(data)
+    # downloads are pure network wait, so overlap them; the cap keeps us polite to the API.
+    # Both listings go out at once and each directory's downloads are queued as soon as
+    # its own listing is back, so post downloads run while the assets listing is in flight.
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        dirs = [("posts", args.posts_path, posts_out, True), ("assets", args.assets_path, assets_out, False)]
+        listings = [pool.submit(listing, src_dir, out_dir, md_only) for _, src_dir, out_dir, md_only in dirs]
+        queued = []
+        for (label, src_dir, out_dir, _), names in zip(dirs, listings):
+            queued.append((label, src_dir, [pool.submit(download, src_dir, out_dir, n, sha)
+                                           for n, sha in names.result().items()]))
+        for label, src_dir, futures in queued:
+            print(f"Fetching {label} from {args.repo}:{src_dir} @ {args.ref}")
+            for f in futures:
+                print(" -", f.result())
+    # with copies instead of links every blob has one link, so nlink says nothing about use
+    if supports_hardlinks(blobs_dir):
+        prune_blobs(blobs_dir)
+    write_last_sync(last_sync_path, sync_key(args), head)
+    client.close()
 
     print("Done.")
 